@@ -1,10 +1,15 @@
 import hashlib
+import hmac
 import base64
 import os
-from datetime import datetime, timedelta
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from fastapi import Depends, HTTPException
+import threading
+import time
+import bcrypt
+import orjson
+from cachetools import TTLCache
+import jwt
+from jwt import InvalidTokenError as JWTError
+from fastapi import Depends, Header, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from database import supabase
 from dotenv import load_dotenv
@@ -14,38 +19,117 @@ load_dotenv()
 SECRET_KEY = os.getenv("JWT_SECRET")
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60))
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))   # keep 12 in prod; 4 is fine for dev/tests
+ADMIN_KEY = os.getenv("ADMIN_KEY")                      # unset = admin endpoints disabled
+
+# Resolved once — the signing key as bytes and the token lifetime in seconds
+_SECRET_BYTES = SECRET_KEY.encode("utf-8") if SECRET_KEY else None
+_EXPIRE_SECONDS = EXPIRE_MINUTES * 60
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 bearer_scheme = HTTPBearer()
 
+# Columns UserResponse needs — never pull hashed_password on the auth path
+_USER_COLUMNS = "id,email,username,profile_pic_url,is_onboarded"
+
+# ── AUTH CACHE ─────────────────────────────────────────────────────────────
+# token digest -> (user_id, exp)  — skips the JWT decode on repeat requests
+# user_id      -> users row       — skips the Supabase round-trip
+# Only a digest of the token is kept in memory, never the token itself.
+AUTH_CACHE_TTL = 60
+_token_cache: TTLCache = TTLCache(maxsize=10_000, ttl=AUTH_CACHE_TTL)
+_user_cache: TTLCache = TTLCache(maxsize=10_000, ttl=AUTH_CACHE_TTL)
+_cache_lock = threading.Lock()
+
 # Encode and Decode
-def _prepare_password(password: str) -> str:
+# hashlib's sha256 is OpenSSL's, which already dispatches to the SHA-NI
+# transform on CPUs that have it (OPENSSL_ia32cap can be used to check/force).
+def _prepare_password(password: str) -> bytes:
     """Pre-hash with SHA-256 to bypass bcrypt's 72-byte limit."""
     digest = hashlib.sha256(password.encode("utf-8")).digest()
-    return base64.b64encode(digest).decode("utf-8")
+    return base64.b64encode(digest)
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(_prepare_password(password))
+    return bcrypt.hashpw(_prepare_password(password), bcrypt.gensalt(BCRYPT_ROUNDS)).decode("utf-8")
 
 def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(_prepare_password(plain), hashed)
+    try:
+        return bcrypt.checkpw(_prepare_password(plain), hashed.encode("utf-8"))
+    except ValueError:
+        # Malformed / non-bcrypt hash stored for this user
+        return False
 
 # JWT AUTHENTICATOR 
 def create_token(user_id: str) -> str:
-    expire = datetime.utcnow() + timedelta(minutes=EXPIRE_MINUTES)
-    return jwt.encode({"sub": user_id, "exp": expire}, SECRET_KEY, algorithm=ALGORITHM)
+    expire = int(time.time()) + _EXPIRE_SECONDS
+    return jwt.encode({"sub": user_id, "exp": expire}, _SECRET_BYTES, algorithm=ALGORITHM)
+
+def forget_user(user_id: str):
+    """Drop a cached users row — call after any write to that row."""
+    with _cache_lock:
+        _user_cache.pop(user_id, None)
+
+def _b64url_decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+def _decode_token(token: str) -> dict:
+    """
+    Verify a token and return its claims.
+    HS256 fast path: we only ever issue HS256 with one key, so skip the header
+    entirely — check the HMAC over "header.payload", then decode the payload.
+    """
+    if ALGORITHM != "HS256":
+        return jwt.decode(token, _SECRET_BYTES, algorithms=[ALGORITHM])
+    try:
+        _, payload_b64, sig_b64 = token.split(".")
+        signing_input = token[:token.rindex(".")].encode("ascii")
+        expected = hmac.new(_SECRET_BYTES, signing_input, hashlib.sha256).digest()
+        # Compare encoded forms: decoding sig_b64 would silently drop stray or
+        # non-canonical characters and accept a mangled signature.
+        expected_b64 = base64.urlsafe_b64encode(expected).rstrip(b"=")
+        if not hmac.compare_digest(expected_b64, sig_b64.encode("ascii")):
+            raise JWTError("Signature verification failed")
+        claims = orjson.loads(_b64url_decode(payload_b64))
+    except (ValueError, UnicodeEncodeError):
+        raise JWTError("Malformed token")
+    exp = claims.get("exp") if isinstance(claims, dict) else None
+    if not isinstance(exp, (int, float)) or exp <= time.time():
+        raise JWTError("Token expired")
+    return claims
 
 # Getting Current User
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)):
-    try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
-
-    result = supabase.table("users").select("*").eq("id", user_id).single().execute()
+    token_key = hashlib.sha256(credentials.credentials.encode("utf-8")).digest()
+    now = time.time()
+
+    with _cache_lock:
+        hit = _token_cache.get(token_key)
+    if hit and hit[1] > now:
+        user_id = hit[0]
+    else:
+        try:
+            payload = _decode_token(credentials.credentials)
+            user_id = payload.get("sub")
+            if not user_id:
+                raise HTTPException(status_code=401, detail="Invalid token")
+        except JWTError:
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
+        with _cache_lock:
+            _token_cache[token_key] = (user_id, payload.get("exp", 0))
+
+    with _cache_lock:
+        user = _user_cache.get(user_id)
+    if user is not None:
+        return user
+
+    result = supabase.table("users").select(_USER_COLUMNS).eq("id", user_id).single().execute()
     if not result.data:
         raise HTTPException(status_code=404, detail="User not found")
-    return result.data
\ No newline at end of file
+    with _cache_lock:
+        _user_cache[user_id] = result.data
+    return result.data
+
+# Admin Key Check
+def require_admin(x_admin_key: str = Header(default="")):
+    """Gate maintenance endpoints behind the X-Admin-Key header."""
+    if not ADMIN_KEY or not hmac.compare_digest(x_admin_key.encode(), ADMIN_KEY.encode()):
+        raise HTTPException(status_code=403, detail="Admin key required")
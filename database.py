@@ -1,4 +1,10 @@
-from supabase import create_client, Client
+import httpx
+from typing import Optional
+from redis.asyncio import Redis
+from supabase import (
+    create_client, Client, ClientOptions,
+    AsyncClient, AsyncClientOptions,
+)
 from dotenv import load_dotenv
 import os
 
@@ -6,5 +12,39 @@ load_dotenv()
 # Load from .env, ensure the db is active and running
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+REDIS_URL = os.getenv("REDIS_URL")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
\ No newline at end of file
+# One keep-alive HTTP/2 pool per client, so requests reuse a warm TLS
+# connection instead of handshaking each time.
+_HTTP_OPTIONS = dict(
+    http2=True,
+    timeout=httpx.Timeout(10.0),
+    limits=httpx.Limits(
+        max_connections=100,
+        max_keepalive_connections=100,
+        keepalive_expiry=300,
+    ),
+    follow_redirects=True,
+)
+http_client = httpx.Client(**_HTTP_OPTIONS)
+async_http_client = httpx.AsyncClient(**_HTTP_OPTIONS)
+
+# Sync client — used by the threadpool (def) routes: auth, session
+supabase: Client = create_client(
+    SUPABASE_URL,
+    SUPABASE_KEY,
+    options=ClientOptions(httpx_client=http_client),
+)
+
+# Async client — used by the async def vault routes so DB calls don't block
+# the event loop. The constructor is sync; the service-role key needs no
+# session lookup, so AsyncClient.create() isn't required.
+async_supabase: AsyncClient = AsyncClient(
+    SUPABASE_URL,
+    SUPABASE_KEY,
+    options=AsyncClientOptions(httpx_client=async_http_client),
+)
+
+# Optional Redis — shared quiz state that survives restarts and works across
+# uvicorn workers. Unset REDIS_URL = quizzes stay in process memory.
+redis_client: Optional[Redis] = Redis.from_url(REDIS_URL) if REDIS_URL else None
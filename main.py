@@ -4,6 +4,7 @@ from routes.users import router as auth_router
 from routes.session import router as session_router
 from routes.vault import router as vault_router
 from database import supabase
+from schemas import StatusResponse, PingResponse
 from datetime import datetime
 
 app = FastAPI(
@@ -30,12 +31,12 @@ app.include_router(session_router)
 app.include_router(vault_router)
 
 
-@app.get("/")
+@app.get("/", response_model=StatusResponse)
 def root():
     return {"status": "Pandora's Vault is open 🔓", "version": "1.0.0"}
 
 
-@app.get("/ping")
+@app.get("/ping", response_model=PingResponse, response_model_exclude_none=True)
 def ping():
     """
     Keep-alive endpoint — pinged every 10 minutes by cron-job.org
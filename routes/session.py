@@ -1,15 +1,58 @@
+import threading
+from typing import Optional
+from cachetools import TTLCache
 from fastapi import APIRouter, Depends, HTTPException
 from database import supabase
 from auth import get_current_user
-from schemas import SessionData, SessionUpdateRequest
+from schemas import SessionData, SessionUpdateRequest, MessageResponse
 
 router = APIRouter(prefix="/session", tags=["session"])
 
+# ── SESSION CACHE ──────────────────────────────────────────────────────────
+# user_id -> SessionData for users that have a user_progress row. Every write
+# to that row in this process must refresh (remember_session) or drop
+# (forget_session) the entry so readers never see a stale row. Only GET
+# /session reads it — the vault's attempt logic always SELECTs, since a
+# per-worker copy can lag behind another worker's write.
+_session_cache: TTLCache = TTLCache(maxsize=10_000, ttl=30)
+_cache_lock = threading.Lock()
+
+
+def cached_session(user_id: str) -> Optional[SessionData]:
+    with _cache_lock:
+        return _session_cache.get(user_id)
+
+
+def remember_session(user_id: str, row: dict) -> SessionData:
+    session = _to_session(row)
+    with _cache_lock:
+        _session_cache[user_id] = session
+    return session
+
+
+def forget_session(user_id: str):
+    with _cache_lock:
+        _session_cache.pop(user_id, None)
+
+
+def _to_session(row: dict) -> SessionData:
+    return SessionData(
+        topic=row.get("topic"),
+        current_level=row.get("current_level"),
+        diagnostic_attempts=row.get("diagnostic_attempts", 0),
+        diagnostic_passed=row.get("diagnostic_passed", False),
+        hint_stage=row.get("hint_stage", 0),
+    )
+
 
 # ── GET SESSION ────────────────────────────────────────────────────────────
 @router.get("/", response_model=SessionData)
 def get_session(current_user=Depends(get_current_user)):
     """Load the user's last saved topic and level from Supabase."""
+    cached = cached_session(current_user["id"])
+    if cached is not None:
+        return cached
+
     result = (
         supabase.table("user_progress")
         .select("*")
@@ -19,14 +62,7 @@ def get_session(current_user=Depends(get_current_user)):
     if not result.data:
         # No progress row yet — return empty session
         return SessionData()
-    row = result.data[0]
-    return SessionData(
-        topic=row.get("topic"),
-        current_level=row.get("current_level"),
-        diagnostic_attempts=row.get("diagnostic_attempts", 0),
-        diagnostic_passed=row.get("diagnostic_passed", False),
-        hint_stage=row.get("hint_stage", 0),
-    )
+    return remember_session(current_user["id"], result.data[0])
 
 
 # ── PATCH SESSION ──────────────────────────────────────────────────────────
@@ -40,41 +76,20 @@ def update_session(body: SessionUpdateRequest, current_user=Depends(get_current_
     if not updates:
         raise HTTPException(status_code=400, detail="Nothing to update")
 
-    # Check if a row already exists
-    existing = (
+    # INSERT ... ON CONFLICT (id) DO UPDATE — one round-trip, no race
+    result = (
         supabase.table("user_progress")
-        .select("id")
-        .eq("id", current_user["id"])
+        .upsert({"id": current_user["id"], **updates}, on_conflict="id")
         .execute()
     )
 
-    if existing.data:
-        result = (
-            supabase.table("user_progress")
-            .update(updates)
-            .eq("id", current_user["id"])
-            .execute()
-        )
-    else:
-        result = (
-            supabase.table("user_progress")
-            .insert({"id": current_user["id"], **updates})
-            .execute()
-        )
-
-    row = result.data[0]
-    return SessionData(
-        topic=row.get("topic"),
-        current_level=row.get("current_level"),
-        diagnostic_attempts=row.get("diagnostic_attempts", 0),
-        diagnostic_passed=row.get("diagnostic_passed", False),
-        hint_stage=row.get("hint_stage", 0),
-    )
+    return remember_session(current_user["id"], result.data[0])
 
 
 # ── RESET SESSION ──────────────────────────────────────────────────────────
-@router.delete("/")
+@router.delete("/", response_model=MessageResponse)
 def reset_session(current_user=Depends(get_current_user)):
     """Reset progress — user wants to start a new topic from scratch."""
     supabase.table("user_progress").delete().eq("id", current_user["id"]).execute()
+    forget_session(current_user["id"])
     return {"message": "Session reset. The Vault awaits you fresh! 🔓"}
\ No newline at end of file
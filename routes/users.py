@@ -1,10 +1,11 @@
 from fastapi import APIRouter, HTTPException, Depends
+from postgrest.exceptions import APIError
 from schemas import (
     SignupRequest, LoginRequest, OnboardRequest,
     UpdateProfileRequest, UserResponse, TokenResponse
 )
 from database import supabase
-from auth import hash_password, verify_password, create_token, get_current_user
+from auth import hash_password, verify_password, create_token, get_current_user, forget_user
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -19,18 +20,29 @@ def fmt_user(u: dict) -> UserResponse:
     )
 
 
+# One UPDATE; the UNIQUE(username) constraint does the "already taken" check
+def _update_user(user_id: str, updates: dict) -> dict:
+    try:
+        result = supabase.table("users").update(updates).eq("id", user_id).execute()
+    except APIError as e:
+        if e.code == "23505":   # unique_violation
+            raise HTTPException(status_code=400, detail="Username already taken")
+        raise
+    forget_user(user_id)
+    return result.data[0]
+
+
 # ── SIGNUP ──────────────────────────────────────────────────────────────────
 @router.post("/signup", response_model=TokenResponse)
 def signup(body: SignupRequest):
-    existing = supabase.table("users").select("id").eq("email", body.email).execute()
-    if existing.data:
-        raise HTTPException(status_code=400, detail="Email already registered")
-
     hashed = hash_password(body.password)
-    result = supabase.table("users").insert({
-        "email": body.email,
-        "hashed_password": hashed,
+    # Single round-trip: returns no rows when the email is already taken
+    result = supabase.rpc("auth_signup", {
+        "p_email": body.email,
+        "p_hashed_password": hashed,
     }).execute()
+    if not result.data:
+        raise HTTPException(status_code=400, detail="Email already registered")
 
     user = result.data[0]
     token = create_token(str(user["id"]))
@@ -58,17 +70,12 @@ def onboard(body: OnboardRequest, current_user=Depends(get_current_user)):
     if current_user["is_onboarded"]:
         raise HTTPException(status_code=400, detail="Already onboarded")
 
-    existing = supabase.table("users").select("id").eq("username", body.username).execute()
-    if existing.data:
-        raise HTTPException(status_code=400, detail="Username already taken")
-
-    result = supabase.table("users").update({
+    user = _update_user(current_user["id"], {
         "username": body.username,
         "profile_pic_url": body.profile_pic_url,
         "is_onboarded": True,
-    }).eq("id", current_user["id"]).execute()
-
-    return fmt_user(result.data[0])
+    })
+    return fmt_user(user)
 
 
 # ── UPDATE PROFILE ───────────────────────────────────────────────────────────
@@ -78,13 +85,7 @@ def update_profile(body: UpdateProfileRequest, current_user=Depends(get_current_
     if not updates:
         raise HTTPException(status_code=400, detail="Nothing to update")
 
-    if "username" in updates:
-        existing = supabase.table("users").select("id").eq("username", updates["username"]).execute()
-        if existing.data and existing.data[0]["id"] != current_user["id"]:
-            raise HTTPException(status_code=400, detail="Username already taken")
-
-    result = supabase.table("users").update(updates).eq("id", current_user["id"]).execute()
-    return fmt_user(result.data[0])
+    return fmt_user(_update_user(current_user["id"], updates))
 
 
 # ── GET ME ───────────────────────────────────────────────────────────────────
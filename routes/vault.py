@@ -1,34 +1,64 @@
+import asyncio
+import random
+import re
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List
-from database import supabase
-from auth import get_current_user
+from typing import List, Optional
+import orjson
+from cachetools import TTLCache
+from database import async_supabase, redis_client
+from auth import get_current_user, require_admin
+from routes.session import remember_session
 from schemas import (
     AskRequest, AskResponse,
     QuizStartRequest, QuizAnswerRequest,
-    QuizSubmitResponse, NextQuestionResponse,
+    QuizSubmitResponse, NextQuestionResponse, MessageResponse,
 )
 from llm import (
-    call_llm, client, MODEL, VAULT_PERSONA, LEVEL_LABELS,
-    generate_quiz_questions, grade_quiz_answer, generate_quiz_summary,
+    call_llm, stream_llm, sse, sse_error, STREAM_ERRORS, clear_lesson_cache, LOCAL_CACHE_TTL, client, MODEL, VAULT_PERSONA, LEVEL_LABELS,
+    generate_quiz_questions, quiz_length, grade_quiz_answer, generate_quiz_summary,
 )
 
 router = APIRouter(prefix="/vault", tags=["vault"])
 
 
 # ── HELPER ─────────────────────────────────────────────────────────────────
-def _save_progress(user_id: str, updates: dict):
-    """Upsert a user_progress row."""
-    existing = supabase.table("user_progress").select("id").eq("id", user_id).execute()
-    if existing.data:
-        supabase.table("user_progress").update(updates).eq("id", user_id).execute()
-    else:
-        supabase.table("user_progress").insert({"id": user_id, **updates}).execute()
+async def _save_progress(user_id: str, updates: dict):
+    """Upsert a user_progress row — one round-trip, insert-or-update."""
+    result = await (
+        async_supabase.table("user_progress")
+        .upsert({"id": user_id, **updates}, on_conflict="id")
+        .execute()
+    )
+    # The upsert returns the full row — keep GET /session's cache in step with it
+    remember_session(user_id, result.data[0])
+
+
+# Fire-and-forget work; holding a reference stops the loop from
+# garbage-collecting a task before it finishes.
+_background_tasks: set = set()
+
+
+def _in_background(coro):
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _warm_lesson_cache(topic: str, level: int, language: Optional[str]):
+    """Generate the lesson ahead of time so /vault/lesson is a cache hit."""
+    try:
+        await call_llm(AskRequest.model_construct(
+            topic=topic, level=level, language=language, message_type="lesson",
+        ))
+    except Exception:
+        pass   # only a prefetch — /vault/lesson will simply generate it
 
 
 # ── GATEKEEPER ─────────────────────────────────────────────────────────────
 @router.post("/gatekeeper", response_model=AskResponse)
-def gatekeeper(req: AskRequest, current_user=Depends(get_current_user)):
+async def gatekeeper(req: AskRequest, current_user=Depends(get_current_user)):
     """
     L1 → skip gatekeeper, go straight to lesson.
     L2-L5 → generate a verification question for the level below.
@@ -37,14 +67,15 @@ def gatekeeper(req: AskRequest, current_user=Depends(get_current_user)):
         raise HTTPException(status_code=400, detail="Level must be 1-5")
 
     if req.level == 1:
-        lesson_req = AskRequest(
+        # Fields come from the already-validated req — skip re-validation
+        lesson_req = AskRequest.model_construct(
             topic=req.topic,
             level=1,
             language=req.language,
             message_type="lesson",
         )
-        response = call_llm(lesson_req)
-        _save_progress(current_user["id"], {
+        response = await call_llm(lesson_req)
+        await _save_progress(current_user["id"], {
             "topic": req.topic,
             "current_level": 1,
             "diagnostic_passed": True,
@@ -53,9 +84,12 @@ def gatekeeper(req: AskRequest, current_user=Depends(get_current_user)):
         })
         return response
 
+    # Speculative: the learner spends a while answering, so build the lesson
+    # they're about to unlock in the meantime.
+    _in_background(_warm_lesson_cache(req.topic, req.level, req.language))
     req.message_type = "generate_question"
-    response = call_llm(req)
-    _save_progress(current_user["id"], {
+    response = await call_llm(req)
+    await _save_progress(current_user["id"], {
         "topic": req.topic,
         "current_level": req.level,
         "diagnostic_passed": False,
@@ -67,26 +101,31 @@ def gatekeeper(req: AskRequest, current_user=Depends(get_current_user)):
 
 # ── SUBMIT (3-try gatekeeper logic) ────────────────────────────────────────
 @router.post("/submit", response_model=AskResponse)
-def submit_answer(req: AskRequest, current_user=Depends(get_current_user)):
+async def submit_answer(req: AskRequest, current_user=Depends(get_current_user)):
     """
     Attempt 1 wrong -> Mermaid hint
     Attempt 2 wrong -> Pseudocode hint
     Attempt 3 wrong -> Full answer reveal + drop level
-    Any attempt right -> lesson
+    Any attempt right -> verdict only; client then calls /vault/lesson
     """
     user_id = current_user["id"]
 
-    state_result = supabase.table("user_progress").select("*").eq("id", user_id).execute()
+    # Always read the row fresh: the attempt count drives the hint sequence, and
+    # the next answer may land on another worker than the last one.
+    state_result = await (
+        async_supabase.table("user_progress")
+        .select("diagnostic_attempts")
+        .eq("id", user_id)
+        .execute()
+    )
     if not state_result.data:
         raise HTTPException(
             status_code=400,
             detail="No active session. Start from /vault/gatekeeper first.",
         )
+    attempts = state_result.data[0].get("diagnostic_attempts") or 0
 
-    state = state_result.data[0]
-    attempts = state.get("diagnostic_attempts", 0)
-
-    check_result = call_llm(AskRequest(
+    check_result = await call_llm(AskRequest.model_construct(
         topic=req.topic,
         level=req.level,
         language=req.language,
@@ -95,65 +134,64 @@ def submit_answer(req: AskRequest, current_user=Depends(get_current_user)):
     ))
 
     # ── PASS ────────────────────────────────────────────────────────────────
+    # Answer right away; the client fetches the (usually cached) lesson itself.
     if check_result.passed is True:
-        _save_progress(user_id, {
+        await _save_progress(user_id, {
             "diagnostic_passed": True,
             "diagnostic_attempts": attempts + 1,
             "hint_stage": 0,
         })
-        lesson = call_llm(AskRequest(
-            topic=req.topic,
-            level=req.level,
-            language=req.language,
-            message_type="lesson",
-        ))
-        lesson.passed = True
-        return lesson
+        check_result.should_fetch_lesson = True
+        return check_result
 
     # ── FAIL ────────────────────────────────────────────────────────────────
+    # Collect every progress change for this attempt and write it once.
     new_attempts = attempts + 1
-    _save_progress(user_id, {"diagnostic_attempts": new_attempts})
+    pending_updates = {"diagnostic_attempts": new_attempts}
+    drop_level = None
 
     if new_attempts == 1:
-        _save_progress(user_id, {"hint_stage": 1})
-        hint = call_llm(AskRequest(
-            topic=req.topic, level=req.level,
-            language=req.language, message_type="hint_mermaid",
-        ))
-        hint.passed = False
-        return hint
-
+        pending_updates["hint_stage"] = 1
+        message_type = "hint_mermaid"
     elif new_attempts == 2:
-        _save_progress(user_id, {"hint_stage": 2})
-        hint = call_llm(AskRequest(
-            topic=req.topic, level=req.level,
-            language=req.language, message_type="hint_pseudocode",
-        ))
-        hint.passed = False
-        return hint
-
+        pending_updates["hint_stage"] = 2
+        message_type = "hint_pseudocode"
     else:
         drop_level = max(1, req.level - 1)
-        _save_progress(user_id, {
+        pending_updates.update({
             "diagnostic_passed": False,
             "current_level": drop_level,
             "hint_stage": 0,
         })
-        reveal = call_llm(AskRequest(
+        message_type = "reveal_answer"
+
+    # The write and the hint don't depend on each other — run them together
+    _, response = await asyncio.gather(
+        _save_progress(user_id, pending_updates),
+        call_llm(AskRequest.model_construct(
             topic=req.topic, level=req.level,
-            language=req.language, message_type="reveal_answer",
-        ))
-        reveal.passed = False
-        reveal.recommended_level = drop_level
-        return reveal
+            language=req.language, message_type=message_type,
+        )),
+    )
+    response.passed = False
+    if drop_level is not None:
+        response.recommended_level = drop_level
+    return response
 
 
 # ── LESSON ──────────────────────────────────────────────────────────────────
 @router.post("/lesson", response_model=AskResponse)
-def get_lesson(req: AskRequest, current_user=Depends(get_current_user)):
+async def get_lesson(req: AskRequest, current_user=Depends(get_current_user)):
     """Reload a lesson the user has already unlocked."""
     req.message_type = "lesson"
-    return call_llm(req)
+    return await call_llm(req)
+
+
+@router.post("/lesson/stream")
+async def stream_lesson(req: AskRequest, current_user=Depends(get_current_user)):
+    """Same as /lesson, streamed as server-sent events (see llm.stream_llm)."""
+    req.message_type = "lesson"
+    return StreamingResponse(stream_llm(req), media_type="text/event-stream")
 
 
 # ── CHAT MODELS ─────────────────────────────────────────────────────────────
@@ -174,30 +212,22 @@ class ChatResponse(BaseModel):
 
 
 # ── CHAT ────────────────────────────────────────────────────────────────────
-@router.post("/chat", response_model=ChatResponse)
-def chat(req: ChatRequest, current_user=Depends(get_current_user)):
-    """
-    Multi-turn chat with Vera.
-    Vera appends [QUIZ_TRIGGER] when she decides the learner is ready for a quiz.
-    """
-    level_label = LEVEL_LABELS.get(req.level, "")
-    user_turns  = sum(1 for m in req.history if m.role == "user")
+_TRIGGER_TAGS = ("[POPQUIZ_TRIGGER]", "[LEVELUP_TRIGGER]")
+_TRIGGER_RE = re.compile(r"\[(POPQUIZ|LEVELUP)_TRIGGER\]")
 
-    quiz_done      = any("QUIZ_DONE"    in m.content for m in req.history)
-    levelup_done   = any("LEVELUP_DONE" in m.content for m in req.history)
 
-    system = (
-        VAULT_PERSONA
-        + f"""
+# Persona + chat instructions, joined once at import; only the context
+# values are filled in per request.
+_CHAT_SYS_TEMPLATE = VAULT_PERSONA + """
 
 Context:
-- Topic: {req.topic} | Level {req.level} ({level_label}) | Language: {req.language}
+- Topic: {topic} | Level {level} ({level_label}) | Language: {language}
 - User messages exchanged so far: {user_turns}
 
 Your job: Answer the student's question warmly and helpfully.
+"""
 
-You have TWO optional signal tags you can append (one at most, on its own line at the end):
-
+POPQUIZ_BLOCK = """
 [POPQUIZ_TRIGGER]
   → Use this for a quick 1-2 question mid-lesson check.
   → Only trigger when ALL true:
@@ -205,61 +235,353 @@ You have TWO optional signal tags you can append (one at most, on its own line a
       2. A specific concept was just explained and the conversation hit a natural pause
       3. "QUIZ_DONE" does NOT appear in history
       4. Student is not confused or mid-question
+"""
 
+LEVELUP_BLOCK = """
 [LEVELUP_TRIGGER]
   → Use this when you judge the ENTIRE level content has been fully taught.
   → Only trigger when ALL true:
       1. At least 7 user messages exchanged
-      2. All key concepts for Level {req.level} on {req.topic} have been covered
+      2. All key concepts for Level {level} on {topic} have been covered
       3. "LEVELUP_DONE" does NOT appear in history
       4. Student seems ready — not confused
+"""
 
+# Intro + rules wrap whichever tag blocks are still on offer. The one-tag
+# wording is written out in full — rewording one set can't silently leave
+# the other contradicting it.
+_TAG_INTRO_BOTH = """
+You have TWO optional signal tags you can append (one at most, on its own line at the end):
+"""
+_TAG_INTRO_ONE = """
+You have ONE optional signal tag you can append (on its own line at the end):
+"""
+_TAG_RULES_BOTH = """
 Rules:
 - Only ever emit ONE tag per response, never both.
 - Never mention either tag or any upcoming quiz to the student.
 - If neither condition is met, emit no tag at all.
 """
+_TAG_RULES_ONE = """
+Rules:
+- Never mention the tag or any upcoming quiz to the student.
+- If its conditions are not met, emit no tag at all.
+"""
+
+
+# (quiz_done, levelup_done) -> full system template. Tags are only offered
+# once a popquiz could fire (3+ user turns) and while a quiz is still
+# pending, so early and finished chats don't pay for ~500 tokens of
+# instructions the model can't act on.
+_CHAT_SYS_TEMPLATES = {
+    (False, False): _CHAT_SYS_TEMPLATE + _TAG_INTRO_BOTH + POPQUIZ_BLOCK + LEVELUP_BLOCK + _TAG_RULES_BOTH,
+    (True,  False): _CHAT_SYS_TEMPLATE + _TAG_INTRO_ONE + LEVELUP_BLOCK + _TAG_RULES_ONE,
+    (False, True):  _CHAT_SYS_TEMPLATE + _TAG_INTRO_ONE + POPQUIZ_BLOCK + _TAG_RULES_ONE,
+    (True,  True):  _CHAT_SYS_TEMPLATE,
+}
+
+
+def _chat_context(req: ChatRequest) -> tuple[list[dict], bool, bool]:
+    """Messages for Vera, plus whether each quiz has already run in this chat."""
+    # One pass over history; each marker stops being searched once found
+    user_turns   = 0
+    quiz_done    = False
+    levelup_done = False
+    for m in req.history:
+        if m.role == "user":
+            user_turns += 1
+        if not quiz_done and "QUIZ_DONE" in m.content:
+            quiz_done = True
+        if not levelup_done and "LEVELUP_DONE" in m.content:
+            levelup_done = True
+
+    template = (
+        _CHAT_SYS_TEMPLATES[quiz_done, levelup_done] if user_turns >= 3
+        else _CHAT_SYS_TEMPLATE
     )
+    system = template.format_map({
+        "topic":       req.topic,
+        "level":       req.level,
+        "level_label": LEVEL_LABELS.get(req.level, ""),
+        "language":    req.language,
+        "user_turns":  user_turns,
+    })
 
     messages = [{"role": "system", "content": system}]
     for msg in req.history:
         messages.append({"role": msg.role, "content": msg.content})
+    return messages, quiz_done, levelup_done
+
+
+def _finish_chat(raw: str, quiz_done: bool, levelup_done: bool) -> ChatResponse:
+    """Pull the trigger tags out of Vera's reply."""
+    # One pass: strip every tag and remember which kinds were present
+    found = set()
+    clean = _TRIGGER_RE.sub(lambda m: found.add(m.group(1)) or "", raw).strip()
+
+    trigger_quiz    = "POPQUIZ" in found and not quiz_done
+    trigger_levelup = "LEVELUP" in found and not levelup_done
+
+    return ChatResponse(content=clean, trigger_quiz=trigger_quiz, trigger_levelup=trigger_levelup)
 
-    completion = client.chat.completions.create(
+
+def _hold_back_tag(buf: str) -> tuple[str, str]:
+    """
+    Split streamed text into (safe to send, held back). Complete trigger tags
+    are dropped; a trailing "[..." that could still become a tag is held until
+    the next chunk decides it.
+    """
+    buf = _TRIGGER_RE.sub("", buf)
+    cut = buf.rfind("[")
+    if cut != -1 and any(tag.startswith(buf[cut:]) for tag in _TRIGGER_TAGS):
+        return buf[:cut], buf[cut:]
+    return buf, ""
+
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat(req: ChatRequest, current_user=Depends(get_current_user)):
+    """
+    Multi-turn chat with Vera.
+    Vera appends [QUIZ_TRIGGER] when she decides the learner is ready for a quiz.
+    """
+    messages, quiz_done, levelup_done = _chat_context(req)
+    completion = await client.chat.completions.create(
         model=MODEL,
         messages=messages,
         temperature=0.7,
         max_completion_tokens=900,
     )
-    raw = completion.choices[0].message.content
+    return _finish_chat(completion.choices[0].message.content, quiz_done, levelup_done)
 
-    trigger_quiz    = "[POPQUIZ_TRIGGER]"  in raw and not quiz_done
-    trigger_levelup = "[LEVELUP_TRIGGER]"  in raw and not levelup_done
 
-    clean = (raw
-             .replace("[POPQUIZ_TRIGGER]", "")
-             .replace("[LEVELUP_TRIGGER]", "")
-             .strip())
+@router.post("/chat/stream")
+async def chat_stream(req: ChatRequest, current_user=Depends(get_current_user)):
+    """
+    Same as /chat, streamed as server-sent events:
+      data: {"delta": ...}                                  — reply text, tags removed
+      event: meta {"trigger_quiz": ..., "trigger_levelup": ...}  — once, at the end
+      event: error {"detail": ...}                          — instead of meta, if the LLM call fails
+    """
+    messages, quiz_done, levelup_done = _chat_context(req)
+
+    async def event_stream():
+        parts: list[str] = []
+        held = ""
+        try:
+            stream = await client.chat.completions.create(
+                model=MODEL,
+                messages=messages,
+                temperature=0.7,
+                max_completion_tokens=900,
+                stream=True,
+            )
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                parts.append(delta)
+                safe, held = _hold_back_tag(held + delta)
+                if safe:
+                    yield sse({"delta": safe})
+        except STREAM_ERRORS:
+            # The 200 is already out — tell the client the reply is incomplete
+            yield sse_error()
+            return
+        if held:
+            yield sse({"delta": held})
+
+        final = _finish_chat("".join(parts), quiz_done, levelup_done)
+        yield sse(
+            {"trigger_quiz": final.trigger_quiz, "trigger_levelup": final.trigger_levelup},
+            event="meta",
+        )
 
-    return ChatResponse(content=clean, trigger_quiz=trigger_quiz, trigger_levelup=trigger_levelup)
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+# ── QUIZ STORE ──────────────────────────────────────────────────────────────
+# { user_id: { questions, current_index, results, topic, level, language, quiz_mode } }
+# With REDIS_URL set, each quiz is two keys (1h TTL) so any worker can serve
+# the next answer and an answer never re-serialises the whole quiz:
+#   quiz:{user_id}:meta     hash — topic, level, language, quiz_mode,
+#                                  questions (JSON), total, current_index
+#   quiz:{user_id}:results  list — one JSON-encoded result per answer
+# Otherwise the quiz lives in this process only, in a bounded TTLCache so
+# abandoned quizzes expire instead of piling up.
+QUIZ_TTL = 3600
+_quiz_store: TTLCache = TTLCache(maxsize=10_000, ttl=QUIZ_TTL)
+
+
+def _quiz_keys(user_id: str) -> tuple[str, str]:
+    return f"quiz:{user_id}:meta", f"quiz:{user_id}:results"
+
+
+def _decode_quiz(meta: dict, results: list) -> Optional[dict]:
+    if b"questions" not in meta:
+        return None
+    return {
+        "questions":     orjson.loads(meta[b"questions"]),
+        "current_index": int(meta[b"current_index"]),
+        "results":       [orjson.loads(r) for r in results],
+        "topic":         meta[b"topic"].decode(),
+        "level":         int(meta[b"level"]),
+        "language":      meta[b"language"].decode() or None,
+        "quiz_mode":     meta[b"quiz_mode"].decode(),
+    }
 
 
-# ── QUIZ IN-MEMORY STORE ────────────────────────────────────────────────────
-# { user_id: { questions, current_index, results, topic, level, language } }
-# Resets on server restart — intentional, quizzes are per-session only
-_quiz_store: dict = {}
+async def _quiz_active(user_id: str) -> bool:
+    if redis_client is None:
+        return user_id in _quiz_store
+    return bool(await redis_client.exists(_quiz_keys(user_id)[0]))
+
+
+async def _quiz_get(user_id: str) -> Optional[dict]:
+    if redis_client is None:
+        return _quiz_store.get(user_id)
+    meta_key, results_key = _quiz_keys(user_id)
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.hgetall(meta_key)
+        pipe.lrange(results_key, 0, -1)
+        meta, results = await pipe.execute()
+    return _decode_quiz(meta, results)
+
+
+async def _quiz_put(user_id: str, store: dict):
+    if redis_client is None:
+        _quiz_store[user_id] = store
+        return
+    meta_key, results_key = _quiz_keys(user_id)
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.delete(meta_key, results_key)
+        pipe.hset(meta_key, mapping={
+            "questions":     orjson.dumps(store["questions"]),
+            "total":         len(store["questions"]),
+            "current_index": store["current_index"],
+            "topic":         store["topic"],
+            "level":         store["level"],
+            "language":      store["language"] or "",
+            "quiz_mode":     store["quiz_mode"],
+        })
+        pipe.expire(meta_key, QUIZ_TTL)
+        await pipe.execute()
+
+
+async def _quiz_delete(user_id: str):
+    if redis_client is None:
+        _quiz_store.pop(user_id, None)
+    else:
+        await redis_client.delete(*_quiz_keys(user_id))
+
+
+def _apply_result(store: dict, result: dict):
+    store["results"].append(result)
+    store["current_index"] = result["question_index"] + 1
+
+
+async def _quiz_record(user_id: str, result: dict) -> Optional[bool]:
+    """
+    Append a graded answer. Returns whether that was the last question,
+    or None if there is no active quiz. Read the full quiz with _quiz_get.
+    """
+    if redis_client is None:
+        store = _quiz_store.get(user_id)
+        if not store:
+            return None
+        _apply_result(store, result)
+        _quiz_store[user_id] = store            # re-set to restart the TTL
+        return store["current_index"] >= len(store["questions"])
+
+    # Append, advance, refresh TTLs and read back just the position — one
+    # round-trip, with no questions/results decoding until the quiz ends.
+    meta_key, results_key = _quiz_keys(user_id)
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.rpush(results_key, orjson.dumps(result))
+        pipe.hset(meta_key, "current_index", result["question_index"] + 1)
+        pipe.expire(meta_key, QUIZ_TTL)
+        pipe.expire(results_key, QUIZ_TTL)
+        pipe.hmget(meta_key, "current_index", "total")
+        *_, (current_index, total) = await pipe.execute()
+    if total is None:
+        # The quiz expired mid-answer — don't leave a stray partial quiz behind
+        await _quiz_delete(user_id)
+        return None
+    return int(current_index) >= int(total)
+
+
+# ── QUESTION BANK ───────────────────────────────────────────────────────────
+# One LLM call fills a bank of questions per (topic, level, language, mode);
+# each quiz samples from it, so a popular topic costs one generation per day
+# instead of one per quiz. With REDIS_URL set, Redis (quizbank:*) holds the
+# banks for every worker and this process only keeps a short-lived copy (same
+# scheme as llm's lesson cache), so clearing reaches all workers quickly.
+QUESTION_BANK_SIZE = 20
+QUESTION_BANK_MIN  = 8             # a short LLM reply isn't worth keeping
+QUESTION_BANK_TTL  = 24 * 3600
+_question_banks: TTLCache = TTLCache(maxsize=256, ttl=LOCAL_CACHE_TTL)
+_bank_inflight: dict[str, asyncio.Task] = {}
+
+
+def _bank_key(topic: str, level: int, language: Optional[str], quiz_mode: str) -> str:
+    lang = (language or "").strip().lower()
+    return f"quizbank:{quiz_mode}:{level}:{lang}:{topic.strip().lower()}"
+
+
+async def _fill_bank(key: str, topic: str, level: int, language: Optional[str],
+                     quiz_mode: str) -> tuple:
+    bank = tuple(await generate_quiz_questions(
+        topic, level, language, quiz_mode=quiz_mode, count=QUESTION_BANK_SIZE,
+    ))
+    if len(bank) >= QUESTION_BANK_MIN:
+        _question_banks[key] = bank
+        if redis_client is not None:
+            await redis_client.set(key, orjson.dumps(bank), ex=QUESTION_BANK_TTL)
+    return bank
+
+
+async def _question_bank(topic: str, level: int, language: Optional[str], quiz_mode: str) -> tuple:
+    key  = _bank_key(topic, level, language, quiz_mode)
+    bank = _question_banks.get(key)
+    if bank is None and redis_client is not None:
+        raw = await redis_client.get(key)
+        if raw:
+            bank = _question_banks[key] = tuple(orjson.loads(raw))
+    if bank is None:
+        # Singleflight, as in llm.call_llm: concurrent cold starts for one key
+        # share a single generation.
+        task = _bank_inflight.get(key)
+        if task is None:
+            task = _bank_inflight[key] = asyncio.create_task(
+                _fill_bank(key, topic, level, language, quiz_mode)
+            )
+            task.add_done_callback(lambda t: _bank_inflight.pop(key, None))
+        bank = await asyncio.shield(task)
+    return bank
+
+
+async def clear_question_banks():
+    """
+    Drop every cached bank — call after a curriculum/prompt change. Other
+    workers' process copies expire within LOCAL_CACHE_TTL.
+    """
+    _question_banks.clear()
+    if redis_client is not None:
+        keys = [k async for k in redis_client.scan_iter(match="quizbank:*")]
+        if keys:
+            await redis_client.delete(*keys)
 
 
 @router.post("/quiz/start", response_model=NextQuestionResponse)
-def quiz_start(req: QuizStartRequest, current_user=Depends(get_current_user)):
+async def quiz_start(req: QuizStartRequest, current_user=Depends(get_current_user)):
     """Generate questions for this topic+level and return the first one."""
     user_id   = current_user["id"]
     mode      = req.quiz_mode or "popquiz"
-    questions = generate_quiz_questions(req.topic, req.level, req.language, quiz_mode=mode)
+    bank      = await _question_bank(req.topic, req.level, req.language, mode)
+    questions = random.sample(bank, k=min(quiz_length(mode), len(bank)))
     if not questions:
         raise HTTPException(status_code=500, detail="Failed to generate quiz questions.")
 
-    _quiz_store[user_id] = {
+    await _quiz_put(user_id, {
         "questions":     questions,
         "current_index": 0,
         "results":       [],
@@ -267,7 +589,7 @@ def quiz_start(req: QuizStartRequest, current_user=Depends(get_current_user)):
         "level":         req.level,
         "language":      req.language,
         "quiz_mode":     mode,          # stored so quiz/answer knows whether to promote
-    }
+    })
     return NextQuestionResponse(
         question_text=questions[0],
         question_index=0,
@@ -276,29 +598,28 @@ def quiz_start(req: QuizStartRequest, current_user=Depends(get_current_user)):
 
 
 @router.post("/quiz/answer", response_model=QuizSubmitResponse)
-def quiz_answer(req: QuizAnswerRequest, current_user=Depends(get_current_user)):
+async def quiz_answer(req: QuizAnswerRequest, current_user=Depends(get_current_user)):
     """Grade the current answer and return next question or final summary."""
     user_id = current_user["id"]
-    store   = _quiz_store.get(user_id)
-    if not store:
+    if not await _quiz_active(user_id):
         raise HTTPException(status_code=400, detail="No active quiz. Call /quiz/start first.")
 
-    passed, feedback = grade_quiz_answer(
+    passed, feedback = await grade_quiz_answer(
         topic=req.topic,
         level=req.level,
         language=req.language,
         question=req.question_text,
         answer=req.user_answer,
     )
-    store["results"].append({
+    is_last = await _quiz_record(user_id, {
         "question_index": req.question_index,
         "question_text":  req.question_text,
         "user_answer":    req.user_answer,
         "passed":         passed,
         "feedback":       feedback,
     })
-    store["current_index"] = req.question_index + 1
-    is_last = store["current_index"] >= len(store["questions"])
+    if is_last is None:
+        raise HTTPException(status_code=400, detail="No active quiz. Call /quiz/start first.")
 
     # More questions left
     if not is_last:
@@ -309,6 +630,9 @@ def quiz_answer(req: QuizAnswerRequest, current_user=Depends(get_current_user)):
         )
 
     # ── All done ─────────────────────────────────────────────────────────
+    store = await _quiz_get(user_id)
+    if not store:
+        raise HTTPException(status_code=400, detail="No active quiz. Call /quiz/start first.")
     results    = store["results"]
     score      = sum(1 for r in results if r["passed"])
     total      = len(results)
@@ -319,7 +643,7 @@ def quiz_answer(req: QuizAnswerRequest, current_user=Depends(get_current_user)):
     next_level = min(5, store["level"] + 1) if promoted else store["level"]
     weak_questions = [r["question_text"] for r in results if not r["passed"]]
 
-    summary = generate_quiz_summary(
+    summary = await generate_quiz_summary(
         topic=store["topic"],
         level=store["level"],
         score=score,
@@ -330,14 +654,14 @@ def quiz_answer(req: QuizAnswerRequest, current_user=Depends(get_current_user)):
     )
 
     if promoted and next_level != store["level"]:
-        _save_progress(user_id, {
+        await _save_progress(user_id, {
             "current_level":      next_level,
             "diagnostic_passed":  True,
             "diagnostic_attempts": 0,
             "hint_stage":         0,
         })
 
-    del _quiz_store[user_id]
+    await _quiz_delete(user_id)
 
     return QuizSubmitResponse(
         passed=passed,
@@ -355,10 +679,10 @@ def quiz_answer(req: QuizAnswerRequest, current_user=Depends(get_current_user)):
 
 
 @router.get("/quiz/next", response_model=NextQuestionResponse)
-def quiz_next(current_user=Depends(get_current_user)):
+async def quiz_next(current_user=Depends(get_current_user)):
     """Return the next unanswered question in the active quiz."""
     user_id = current_user["id"]
-    store   = _quiz_store.get(user_id)
+    store   = await _quiz_get(user_id)
     if not store:
         raise HTTPException(status_code=400, detail="No active quiz.")
     idx = store["current_index"]
@@ -368,4 +692,19 @@ def quiz_next(current_user=Depends(get_current_user)):
         question_text=store["questions"][idx],
         question_index=idx,
         total_questions=len(store["questions"]),
-    )
\ No newline at end of file
+    )
+
+
+# ── ADMIN ──────────────────────────────────────────────────────────────────
+@router.post("/admin/cache/clear", response_model=MessageResponse,
+             dependencies=[Depends(require_admin)])
+async def clear_caches():
+    """
+    Drop cached lessons and quiz question banks after a curriculum update.
+    Clears Redis and this worker at once; other workers follow within
+    LOCAL_CACHE_TTL (5 min). Without Redis each worker has its own caches,
+    so this only reaches the worker that served the request.
+    """
+    await clear_lesson_cache()
+    await clear_question_banks()
+    return {"message": "Lesson and question caches cleared."}
@@ -39,6 +39,19 @@ class TokenResponse(BaseModel):
     token_type: str = "bearer"
     user: UserResponse
 
+class MessageResponse(BaseModel):
+    message: str
+
+class StatusResponse(BaseModel):
+    status: str
+    version: str
+
+class PingResponse(BaseModel):
+    status: str
+    db: str                                      # "reachable" / "unreachable"
+    pinged_at: str
+    error: Optional[str] = None                  # only set when db is unreachable
+
 # ── VAULT / SESSION SCHEMAS ────────────────────────────────────────────────
 class SessionData(BaseModel):
     topic: Optional[str] = None
@@ -74,6 +87,7 @@ class AskResponse(BaseModel):
     passed: Optional[bool] = None               # for check_answer: True/False
     mermaid_code: Optional[str] = None          # extracted mermaid block if any
     recommended_level: Optional[int] = None     # set when redirecting user
+    should_fetch_lesson: bool = False           # submit passed: client calls /vault/lesson next
 
 # ── QUIZ SCHEMAS ───────────────────────────────────────────────────────────
 class QuizStartRequest(BaseModel):
@@ -36,6 +36,18 @@ CREATE TRIGGER update_user_progress_updated_at
     FOR EACH ROW
     EXECUTE FUNCTION update_updated_at_column();
 
+-- ── RPC: auth_signup ─────────────────────────────────────────────────────
+-- Insert-if-absent in one round-trip (used by POST /auth/signup).
+-- Returns the new row, or no rows if the email is already registered.
+
+CREATE OR REPLACE FUNCTION auth_signup(p_email TEXT, p_hashed_password TEXT)
+RETURNS SETOF users AS $$
+    INSERT INTO users (email, hashed_password)
+    VALUES (p_email, p_hashed_password)
+    ON CONFLICT (email) DO NOTHING
+    RETURNING *;
+$$ language 'sql';
+
 -- ══════════════════════════════════════════════════════════════════════════
 -- PANDORA'S VAULT — COMPLETE RLS POLICY SETUP
 -- Run this entire file in your Supabase SQL Editor after unpausing.
@@ -74,10 +86,10 @@ ALTER TABLE user_progress ENABLE ROW LEVEL SECURITY;
 -- users table
 --
 -- Backend operations (from users.py):
---   signup:  INSERT a new user row
+--   signup:  INSERT a new user row (via the auth_signup RPC)
 --   login:   SELECT by email (needs hashed_password)
 --   onboard: UPDATE username, profile_pic_url, is_onboarded by id
---   get_me:  SELECT * by id
+--   get_me:  SELECT id, email, username, profile_pic_url, is_onboarded by id
 --   profile: UPDATE username/profile_pic_url by id
 --
 -- The backend uses SUPABASE_KEY (service role) which bypasses RLS.
@@ -108,7 +120,7 @@ WITH CHECK (id::text = current_setting('request.jwt.claims', true)::json->>'sub'
 --
 -- Backend operations (from session.py):
 --   GET /session:   SELECT * WHERE id = current_user["id"]
---   PATCH /session: INSERT {id, ...fields} OR UPDATE fields WHERE id = user_id
+--   PATCH /session: UPSERT {id, ...fields} ON CONFLICT (id)
 --   DELETE /session: DELETE WHERE id = user_id
 --
 -- The id column in user_progress = user's UUID (same as users.id).
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# auth/database read these at import; the tests never reach Supabase itself
+os.environ.setdefault("SUPABASE_URL", "https://example.supabase.co")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+os.environ.setdefault("JWT_SECRET", "test-secret-at-least-32-bytes-long!!")
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,98 @@
+import base64
+import hashlib
+import hmac
+import time
+
+import jwt
+import orjson
+import pytest
+
+import auth
+from auth import JWTError, _decode_token, create_token
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _sign(payload) -> str:
+    """An HS256 token over an arbitrary payload, signed with the app key."""
+    signing_input = _b64(b'{"alg":"HS256","typ":"JWT"}') + "." + _b64(orjson.dumps(payload))
+    sig = hmac.new(auth._SECRET_BYTES, signing_input.encode(), hashlib.sha256).digest()
+    return signing_input + "." + _b64(sig)
+
+
+def test_valid_token_round_trips():
+    claims = _decode_token(create_token("user-1"))
+    assert claims["sub"] == "user-1"
+
+
+def test_matches_pyjwt_on_valid_token():
+    token = create_token("user-1")
+    assert _decode_token(token) == jwt.decode(token, auth._SECRET_BYTES, algorithms=["HS256"])
+
+
+@pytest.mark.parametrize("suffix", ["!!", "=", "==", "A"])
+def test_junk_after_signature_is_rejected(suffix):
+    with pytest.raises(JWTError):
+        _decode_token(create_token("user-1") + suffix)
+
+
+def test_tampered_payload_is_rejected():
+    header, _, sig = create_token("user-1").split(".")
+    forged = _b64(orjson.dumps({"sub": "admin", "exp": int(time.time()) + 600}))
+    with pytest.raises(JWTError):
+        _decode_token(f"{header}.{forged}.{sig}")
+
+
+def test_wrong_key_is_rejected():
+    token = jwt.encode({"sub": "user-1", "exp": int(time.time()) + 600}, "another-key-that-is-also-32-bytes-long", algorithm="HS256")
+    with pytest.raises(JWTError):
+        _decode_token(token)
+
+
+@pytest.mark.parametrize("cut", [1, 5])
+def test_truncated_signature_is_rejected(cut):
+    with pytest.raises(JWTError):
+        _decode_token(create_token("user-1")[:-cut])
+
+
+@pytest.mark.parametrize("token", ["", "abc", "a.b", "a.b.c.d"])
+def test_malformed_token_is_rejected(token):
+    with pytest.raises(JWTError):
+        _decode_token(token)
+
+
+def test_non_canonical_signature_is_rejected():
+    # A 32-byte MAC encodes to 43 chars; the last char carries 2 unused bits,
+    # so flipping them decodes to the same bytes but is not the canonical form.
+    token = create_token("user-1")
+    last = token[-1]
+    alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+    twin = alphabet[alphabet.index(last) ^ 1]
+    variant = token[:-1] + twin
+    assert base64.urlsafe_b64decode(variant.rsplit(".", 1)[1] + "=") == \
+        base64.urlsafe_b64decode(token.rsplit(".", 1)[1] + "=")
+    with pytest.raises(JWTError):
+        _decode_token(variant)
+
+
+def test_expired_token_is_rejected():
+    with pytest.raises(JWTError):
+        _decode_token(_sign({"sub": "user-1", "exp": int(time.time()) - 1}))
+
+
+def test_missing_exp_is_rejected():
+    with pytest.raises(JWTError):
+        _decode_token(_sign({"sub": "user-1"}))
+
+
+@pytest.mark.parametrize("payload", [["user-1"], "user-1", 42, None])
+def test_non_dict_payload_is_rejected(payload):
+    with pytest.raises(JWTError):
+        _decode_token(_sign(payload))
+
+
+def test_non_ascii_token_is_rejected():
+    with pytest.raises(JWTError):
+        _decode_token(create_token("user-1") + "é")